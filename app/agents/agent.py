@@ -1,21 +1,107 @@
 import logging
 import os
 import re
+from contextlib import nullcontext
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Any, ContextManager, Dict, List, Optional
 
 from langchain_community.utilities import SQLDatabase
 from langchain_openai import ChatOpenAI
+from pydantic import Field
+from sqlalchemy import Engine, create_engine, text
 
+from app.concurrency import ConcurrencyGovernor, ResourceLimiter
 from app.utils import load_json_file
 
 
+if TYPE_CHECKING:
+    from app.analytics import QueryRouter
+
+
+UNSAFE_SQL_KEYWORDS: tuple[str, ...] = ('DELETE', 'DROP', 'TRUNCATE', 'UPDATE', 'INSERT', 'ALTER', 'CREATE', 'REPLACE')
+
+
+def is_safe_query(query: str) -> bool:
+    """
+    Checks that the query contains none of the statements that may modify the database.
+
+    Args:
+    query (str): The SQL query to check.
+
+    Returns:
+    bool: True if the query contains no unsafe keywords, False otherwise.
+    """
+    for keyword in UNSAFE_SQL_KEYWORDS:
+        if re.search(r'\b' + keyword + r'\b', query, re.IGNORECASE):
+            return False
+    return True
+
+
+@lru_cache(maxsize=None)
+def get_engine(db_url: str) -> Engine:
+    """
+    Returns the engine for the URL, created once per process so that its connection pool is shared.
+
+    Args:
+    db_url (str): The database URL.
+
+    Returns:
+    Engine: The shared SQLAlchemy engine.
+    """
+    return create_engine(db_url)
+
+
+@lru_cache(maxsize=None)
+def get_sql_database(db_url: str) -> SQLDatabase:
+    """
+    Returns the SQLDatabase for the URL, created once per process so that the schema is reflected only once.
+
+    Args:
+    db_url (str): The database URL.
+
+    Returns:
+    SQLDatabase: The shared SQLDatabase instance.
+    """
+    return SQLDatabase(get_engine(db_url))
+
+
+@lru_cache(maxsize=None)
+def get_table_info(db_url: str) -> str:
+    """
+    Returns the schema description used in the SQL generation prompt, computed once per process.
+
+    Args:
+    db_url (str): The database URL.
+
+    Returns:
+    str: The table definitions with sample rows.
+    """
+    return get_sql_database(db_url).get_table_info()
+
+
+class GovernedChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI client that holds a slot of the given limiter for every completion request.
+    """
+
+    limiter: Optional[ResourceLimiter] = Field(default=None, exclude=True)
+
+    def _generate(self, *args: Any, **kwargs: Any) -> Any:
+        if self.limiter is None:
+            return super()._generate(*args, **kwargs)
+        with self.limiter.slot():
+            return super()._generate(*args, **kwargs)
+
+
 class SQLAgent:
     def __init__(
         self,
         db_url: str,
         llm_model: str = "gpt-4-mini",
-        openai_api_base: str = 'https://openrouter.ai/api/v1'
+        openai_api_base: str = 'https://openrouter.ai/api/v1',
+        query_router: Optional["QueryRouter"] = None,
+        governor: Optional[ConcurrencyGovernor] = None
     ) -> None:
         """
         Initializes the SQLAgent with the given database URL, LLM model, and OpenAI API base.
@@ -24,12 +110,17 @@ class SQLAgent:
         db_url (str): The database URL.
         llm_model (str): The LLM model name.
         openai_api_base (str): The OpenAI API base URL.
+        query_router (Optional[QueryRouter]): Routes aggregate queries to the analytics mirror when set.
+        governor (Optional[ConcurrencyGovernor]): Limits concurrent LLM calls and database executions when set.
         """
         parent_dir_path: Path = Path(__file__).parent.parent.parent
-        self.db = SQLDatabase.from_uri(db_url)
+        self.governor = governor
+        self.db_url = db_url
+        self.db = get_sql_database(db_url)
         self.llm = self._create_llm(llm_model, openai_api_base)
         self.prompts = load_json_file(parent_dir_path / 'config/prompts.json')
         self.messages = load_json_file(parent_dir_path / 'config/messages.json')
+        self.query_router = query_router
 
     def _create_llm(self, model: str, api_base: str) -> ChatOpenAI:
         """
@@ -45,13 +136,22 @@ class SQLAgent:
         openai_api_key: str | None = os.environ.get("OPENAI_API_KEY")
         if not openai_api_key:
             raise ValueError("OPENAI_API_KEY environment variable is not set")
-        return ChatOpenAI(
+        return GovernedChatOpenAI(
             model=model,
             openai_api_key=openai_api_key,
             openai_api_base=api_base,
-            verbose=True
+            verbose=True,
+            limiter=self.governor.llm if self.governor is not None else None
         )
 
+    def _db_slot(self) -> ContextManager[None]:
+        """
+        Returns a context manager holding a database slot of the governor, if one is configured.
+        """
+        if self.governor is None:
+            return nullcontext()
+        return self.governor.db.slot()
+
     def _extract_sql_query(self, response: str) -> Optional[str]:
         """
         Extract SQL query from the response string.
@@ -77,3 +177,47 @@ class SQLAgent:
 
         logging.error(f"No SQL query found in the response: {response}")
         return None
+
+    def _is_safe_query(self, query: str) -> bool:
+        """
+        Checks that the query contains none of the statements that may modify the database.
+
+        Args:
+        query (str): The SQL query to check.
+
+        Returns:
+        bool: True if the query is safe to execute, False otherwise.
+        """
+        return is_safe_query(query)
+
+    def _fetch_rows(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Executes the query through the query router if one is configured, otherwise on the database directly.
+
+        Args:
+        query (str): The SQL query to execute.
+
+        Returns:
+        List[Dict[str, Any]]: The result rows.
+        """
+        with self._db_slot():
+            if self.query_router is None:
+                with get_engine(self.db_url).connect() as connection:
+                    return [row._asdict() for row in connection.execute(text(query))]
+            return self.query_router.run(query)
+
+    def _run_query(self, query: str) -> str:
+        """
+        Executes the query and formats the result the same way as SQLDatabase.run.
+
+        Args:
+        query (str): The SQL query to execute.
+
+        Returns:
+        str: The result rows as a string, or an empty string if there are none.
+        """
+        if self.query_router is None:
+            with self._db_slot():
+                return self.db.run(query)
+        rows = self._fetch_rows(query)
+        return str([tuple(row.values()) for row in rows]) if rows else ""
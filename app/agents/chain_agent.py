@@ -1,12 +1,14 @@
 import logging
+from typing import Optional
 
 from langchain.chains import create_sql_query_chain
-from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableSerializable
 
 from app.agents.agent import SQLAgent
+from app.analytics import QueryRouter
+from app.concurrency import AdmissionRejected, ConcurrencyGovernor
 
 
 class ChainSQLAgent(SQLAgent):
@@ -15,20 +17,21 @@ class ChainSQLAgent(SQLAgent):
         self,
         db_url: str,
         llm_model: str = "gpt-4o-mini",
-        openai_api_base: str = 'https://openrouter.ai/api/v1'
+        openai_api_base: str = 'https://openrouter.ai/api/v1',
+        query_router: Optional[QueryRouter] = None,
+        governor: Optional[ConcurrencyGovernor] = None
     ) -> None:
-        super().__init__(db_url, llm_model, openai_api_base)
+        super().__init__(db_url, llm_model, openai_api_base, query_router, governor)
         self.chain: RunnableSerializable = self._create_chain()
         self.raw_sql = ''
         self.topic_filter_chain = self._create_topic_filter_chain()
 
     def _create_chain(self) -> RunnableSerializable:
         answer_prompt: PromptTemplate = PromptTemplate.from_template(self.prompts['CHAIN_ANSWER_PROMPT'])
-        execute_query: QuerySQLDataBaseTool = QuerySQLDataBaseTool(db=self.db)
         write_query: RunnableSerializable = create_sql_query_chain(self.llm, self.db)
         return (
             RunnablePassthrough.assign(query=lambda x: self._extract_sql_query(write_query.invoke(x)))
-            .assign(result=lambda x: self._execute_read_only_query(x["query"], execute_query))
+            .assign(result=lambda x: self._execute_read_only_query(x["query"]))
             | answer_prompt
             | self.llm
             | StrOutputParser()
@@ -41,12 +44,17 @@ class ChainSQLAgent(SQLAgent):
         prompt = ChatPromptTemplate.from_template(self.prompts['CHAIN_TOPIC_FILTER_PROMPT'])
         return prompt | self.llm | StrOutputParser()
 
-    def _execute_read_only_query(self, query: str, execute_query: QuerySQLDataBaseTool) -> str:
+    def _execute_read_only_query(self, query: str) -> str:
         """
         Execute the query in read-only mode.
         """
         if self._is_read_only_query(query):
-            return execute_query.run(query)
+            try:
+                return self._run_query(query)
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                return f"Error: {e}"
         else:
             return "This query is not allowed as it may modify the database. Only SELECT statements are permitted."
 
@@ -74,6 +82,8 @@ class ChainSQLAgent(SQLAgent):
 
             response: str = self.chain.invoke({"question": question})
             return response, self.raw_sql
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logging.error(f"An error occurred: {str(e)}")
             return self.messages["CHAIN_ERROR_MESSAGE"], ""
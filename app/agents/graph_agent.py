@@ -1,12 +1,22 @@
 import logging
 import re
+from functools import lru_cache
 from typing import Annotated, Any, Dict, List, Optional, Tuple, TypedDict
 
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, StateGraph
 
-from app.agents.agent import SQLAgent
+from app.agents.agent import SQLAgent, get_table_info
+from app.analytics import QueryRouter, get_query_router, run_on_rows
+from app.concurrency import AdmissionRejected, ConcurrencyGovernor, get_governor
+from app.sessions import get_session_checkpointer
+from app.utils import get_db_connection_string
+
+
+PREVIOUS_RESULT_TABLE = "previous_result"
+MAX_RESULT_ROWS = 10000
 
 
 class AgentState(TypedDict):
@@ -14,7 +24,11 @@ class AgentState(TypedDict):
     next: Annotated[str, "The next function to call"]
     sql_query: Optional[str]
     query_result: Optional[List[Dict[str, Any]]]
+    query_result_truncated: bool
     original_question: str
+    previous_question: Optional[str]
+    previous_sql_query: Optional[str]
+    previous_query_result: Optional[List[Dict[str, Any]]]
 
 
 class GraphSQLAgent(SQLAgent):
@@ -22,9 +36,15 @@ class GraphSQLAgent(SQLAgent):
         self,
         db_url: str,
         llm_model: str = "gpt-4-mini",
-        openai_api_base: str = 'https://openrouter.ai/api/v1'
+        openai_api_base: str = 'https://openrouter.ai/api/v1',
+        query_router: Optional[QueryRouter] = None,
+        governor: Optional[ConcurrencyGovernor] = None,
+        checkpointer: Optional[BaseCheckpointSaver] = None,
+        max_session_messages: int = 20
     ) -> None:
-        super().__init__(db_url, llm_model, openai_api_base)
+        super().__init__(db_url, llm_model, openai_api_base, query_router, governor)
+        self.checkpointer = checkpointer
+        self.max_session_messages = max_session_messages
         self.app = self._create_graph()
 
     def _create_graph(self) -> StateGraph:
@@ -72,14 +92,17 @@ class GraphSQLAgent(SQLAgent):
             }
         )
 
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
 
     def _node_check_topic(self, state: AgentState) -> AgentState:
         prompt = ChatPromptTemplate.from_messages([
             ("system", self.prompts["GRAPH_TOPIC_FILTER_PROMPT"]),
             ("human", "{input}")
         ])
-        response = self.llm.invoke(prompt.format_messages(input=state["messages"][-1].content))
+        question = state["messages"][-1].content
+        if state.get("previous_question"):
+            question = f"Previous question: {state['previous_question']}\nFollow-up question: {question}"
+        response = self.llm.invoke(prompt.format_messages(input=question))
         if response.content.strip().upper() == "YES":
             state["next"] = "generate_sql"
         else:
@@ -88,12 +111,13 @@ class GraphSQLAgent(SQLAgent):
         return state
 
     def _node_generate_sql(self, state: AgentState) -> AgentState:
-        db_schema = self.db.get_table_info()
+        with self._db_slot():
+            db_schema = get_table_info(self.db_url)
         prompt = ChatPromptTemplate.from_messages([
             ("system", self.prompts["GRAPH_SYSTEM_PROMPT"].format(db_schema=db_schema)),
             ("human", "{input}")
         ])
-        response = self.llm.invoke(prompt.format_messages(input=state["messages"][-1].content))
+        response = self.llm.invoke(prompt.format_messages(input=self._sql_generation_input(state)))
         extracted_query = self._extract_sql_query(response.content)
         if extracted_query:
             state["sql_query"] = extracted_query
@@ -103,6 +127,44 @@ class GraphSQLAgent(SQLAgent):
             state["next"] = "end"
         return state
 
+    def _can_reuse_previous_result(self, state: AgentState) -> bool:
+        rows = state.get("previous_query_result")
+        return bool(rows)
+
+    def _sql_generation_input(self, state: AgentState) -> str:
+        question = state["messages"][-1].content
+        if not state.get("previous_sql_query"):
+            return question
+
+        follow_up = self.prompts["GRAPH_FOLLOW_UP_PROMPT"].format(
+            previous_question=state["previous_question"],
+            previous_sql_query=state["previous_sql_query"],
+            question=question
+        )
+        if self._can_reuse_previous_result(state):
+            columns = ", ".join(state["previous_query_result"][0].keys())
+            follow_up += "\n" + self.prompts["GRAPH_PREVIOUS_RESULT_PROMPT"].format(columns=columns)
+        return follow_up
+
+    def _uses_previous_result(self, state: AgentState) -> bool:
+        return (
+            self._can_reuse_previous_result(state)
+            and re.search(r'\b' + PREVIOUS_RESULT_TABLE + r'\b', state["sql_query"], re.IGNORECASE) is not None
+        )
+
+    @staticmethod
+    def _compose_previous_result_query(previous_sql_query: str, sql_query: str) -> str:
+        """
+        Inlines the previous query as the previous_result table so the follow-up also runs on Postgres.
+        """
+        previous = previous_sql_query.strip().rstrip(';').strip()
+        query = sql_query.strip().rstrip(';').strip()
+        match = re.match(r'with(\s+recursive)?\s+', query, re.IGNORECASE)
+        if match:
+            recursive = " RECURSIVE" if match.group(1) else ""
+            return f"WITH{recursive} {PREVIOUS_RESULT_TABLE} AS ({previous}), {query[match.end():]}"
+        return f"WITH {PREVIOUS_RESULT_TABLE} AS ({previous})\n{query}"
+
     def _node_execute_sql(self, state: AgentState) -> AgentState:
         if not self._is_safe_query(state["sql_query"]):
             error_message = "The generated query contains potentially unsafe operations and cannot be executed."
@@ -111,15 +173,20 @@ class GraphSQLAgent(SQLAgent):
             return state
 
         try:
-            result = self.db.run(state["sql_query"])
-            if isinstance(result, list):
-                state["query_result"] = result
-            elif isinstance(result, str):
-                state["query_result"] = [{"result": result}]
+            if self._uses_previous_result(state):
+                logging.info("Answering the follow-up from the previous query result")
+                rows = run_on_rows(state["sql_query"], PREVIOUS_RESULT_TABLE, state["previous_query_result"])
+                state["sql_query"] = self._compose_previous_result_query(
+                    state["previous_sql_query"], state["sql_query"]
+                )
             else:
-                state["query_result"] = [dict(row) for row in result]
+                rows = self._fetch_rows(state["sql_query"])
+            state["query_result"] = rows[:MAX_RESULT_ROWS]
+            state["query_result_truncated"] = len(rows) > MAX_RESULT_ROWS
 
             state["next"] = "format_response"
+        except AdmissionRejected:
+            raise
         except Exception as e:
             state["messages"].append(AIMessage(content=f"Error executing SQL query: {str(e)}"))
             state["next"] = "end"
@@ -138,35 +205,122 @@ class GraphSQLAgent(SQLAgent):
             Please provide a natural language answer to the original question based on these results:""")
         ])
 
+        original_question = state["original_question"]
+        if state.get("previous_question"):
+            original_question = f"{state['previous_question']} Follow-up: {original_question}"
+
+        query_result = state["query_result"]
+        if state.get("query_result_truncated"):
+            query_result = f"{query_result} (only the first {MAX_RESULT_ROWS} rows)"
+
         response = self.llm.invoke(prompt.format_messages(
-            original_question=state["original_question"],
-            query_result=state["query_result"]
+            original_question=original_question,
+            query_result=query_result
         ))
 
         state["messages"].append(AIMessage(content=response.content))
         state["next"] = "end"
         return state
 
-    def _is_safe_query(self, query: str) -> bool:
-        unsafe_keywords = ['DELETE', 'DROP', 'TRUNCATE', 'UPDATE', 'INSERT', 'ALTER', 'CREATE', 'REPLACE']
-        for keyword in unsafe_keywords:
-            if re.search(r'\b' + keyword + r'\b', query, re.IGNORECASE):
-                return False
-        return True
+    def _create_initial_state(self, question: str) -> AgentState:
+        return AgentState(
+            messages=[HumanMessage(content=question)],
+            next="",
+            sql_query=None,
+            query_result=None,
+            query_result_truncated=False,
+            original_question=question,
+            previous_question=None,
+            previous_sql_query=None,
+            previous_query_result=None
+        )
 
-    def query(self, question: str) -> Tuple[str, str]:
-        try:
-            initial_state = AgentState(
-                messages=[HumanMessage(content=question)],
-                next="",
-                sql_query=None,
-                query_result=None,
-                original_question=question
+    def _create_session_state(self, question: str, config: Dict[str, Any]) -> AgentState:
+        """
+        Builds the state for the next turn of a session from its last checkpoint.
+
+        The previous question, SQL query and result are carried over from the last turn
+        that produced a result, and the message history is capped at max_session_messages.
+        Truncated results are not carried over, since follow-ups on them would
+        miss rows.
+        """
+        state = self._create_initial_state(question)
+        previous = self.app.get_state(config).values
+        if not previous:
+            return state
+
+        history = previous["messages"][-(self.max_session_messages - 1):] if self.max_session_messages > 1 else []
+        state["messages"] = history + state["messages"]
+        if previous.get("query_result") is not None:
+            state["previous_question"] = previous["original_question"]
+            state["previous_sql_query"] = previous["sql_query"]
+            state["previous_query_result"] = (
+                None if previous.get("query_result_truncated") else previous["query_result"]
             )
-            final_state = self.app.invoke(initial_state)
+        else:
+            state["previous_question"] = previous.get("previous_question")
+            state["previous_sql_query"] = previous.get("previous_sql_query")
+            state["previous_query_result"] = previous.get("previous_query_result")
+        return state
+
+    def generate_sql(self, question: str) -> Optional[str]:
+        """
+        Runs the topic check and SQL generation nodes without executing the query.
+
+        Args:
+        question (str): The user's question.
+
+        Returns:
+        Optional[str]: The generated SQL query, or None if the question is off-topic or no query was produced.
+        """
+        state = self._node_check_topic(self._create_initial_state(question))
+        if state["next"] != "generate_sql":
+            return None
+        state = self._node_generate_sql(state)
+        if state["next"] != "execute_sql":
+            return None
+        return state["sql_query"]
+
+    def query(self, question: str, session_id: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Answers the question, continuing the given session if a checkpointer is configured.
+
+        Args:
+        question (str): The user's question.
+        session_id (Optional[str]): Identifies the conversation that follow-up questions belong to.
+
+        Returns:
+        Tuple[str, str]: The answer and the raw SQL query.
+        """
+        try:
+            if session_id and self.checkpointer is not None:
+                config = {"configurable": {"thread_id": session_id}}
+                final_state = self.app.invoke(self._create_session_state(question, config), config)
+            else:
+                final_state = self.app.invoke(self._create_initial_state(question))
             result = final_state["messages"][-1].content
-            raw_sql = self.raw_sql
+            raw_sql = final_state.get("sql_query") or ""
             return result, raw_sql
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logging.error(f"An error occurred: {str(e)}")
             return self.messages["GRAPH_ERROR_MESSAGE"], ""
+
+
+@lru_cache(maxsize=1)
+def get_graph_agent() -> GraphSQLAgent:
+    """
+    Returns the process-wide GraphSQLAgent, so that its graph is compiled once per worker.
+
+    The agent keeps no per-request state and is shared by concurrent requests.
+
+    Returns:
+    GraphSQLAgent: The agent configured from the environment.
+    """
+    return GraphSQLAgent(
+        get_db_connection_string(),
+        query_router=get_query_router(),
+        checkpointer=get_session_checkpointer(),
+        governor=get_governor()
+    )
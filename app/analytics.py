@@ -0,0 +1,372 @@
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+import duckdb
+from sqlalchemy import Date, Engine, Integer, Numeric, String, Table, create_engine, select, text
+
+from app.agents.agent import is_safe_query
+from app.models import Base
+from app.utils import get_db_connection_string
+
+
+SYNC_BATCH_SIZE = 10000
+SYNC_OVERLAP = 1000
+MAX_MISMATCHED_QUERIES = 1000
+
+AGGREGATE_PATTERN = re.compile(r'\b(?:count|sum|avg|min|max)\s*\(|\bgroup\s+by\b', re.IGNORECASE)
+POINT_LOOKUP_PATTERN = re.compile(r'\bwhere\b.*?\b(?:\w+\.)?id\s*=\s*\d+', re.IGNORECASE | re.DOTALL)
+ORDER_BY_PATTERN = re.compile(r'\border\s+by\b', re.IGNORECASE)
+
+
+def _duckdb_type(column) -> str:
+    """
+    Maps a SQLAlchemy column type from app.models to the matching DuckDB type.
+    """
+    column_type = column.type
+    if isinstance(column_type, Integer):
+        return "INTEGER"
+    if isinstance(column_type, Numeric):
+        return f"DECIMAL({column_type.precision or 18}, {column_type.scale or 0})"
+    if isinstance(column_type, Date):
+        return "DATE"
+    if isinstance(column_type, String):
+        return "VARCHAR"
+    raise ValueError(f"Unsupported column type for the analytics mirror: {column_type!r}")
+
+
+class AnalyticsMirror:
+    """
+    Embedded DuckDB copy of the application tables for aggregate queries.
+
+    Tables are synchronized incrementally by their ``id`` high-water mark, which
+    matches how ``orders`` grows. The last ``overlap`` ids below the mark are copied
+    again on every sync, so rows whose transaction committed after a higher id was
+    copied are picked up as long as they fall in that window. Updates and deletes of
+    older rows are not propagated.
+
+    The connection uses integer division like Postgres, so ``7 / 2`` is 3.
+    """
+
+    def __init__(
+        self,
+        postgres_engine: Engine,
+        path: str = ":memory:",
+        batch_size: int = SYNC_BATCH_SIZE,
+        overlap: int = SYNC_OVERLAP
+    ) -> None:
+        self.postgres_engine = postgres_engine
+        self.batch_size = batch_size
+        self.overlap = overlap
+        self.connection = duckdb.connect(path)
+        self.tables: List[Table] = [
+            Base.metadata.tables[name] for name in ("users", "products", "orders")
+        ]
+        self.last_synced_at: Optional[float] = None
+        self._sync_lock = threading.Lock()
+        self._create_tables()
+        self.connection.execute("SET GLOBAL integer_division = true")
+        _disable_external_access(self.connection)
+
+    def _create_tables(self) -> None:
+        for table in self.tables:
+            columns = ", ".join(f'"{column.name}" {_duckdb_type(column)}' for column in table.columns)
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{table.name}" ({columns})')
+
+    def high_water_mark(self, table_name: str) -> int:
+        row = self.connection.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{table_name}"').fetchone()
+        return row[0]
+
+    def _sync_table(self, table: Table) -> int:
+        start = max(self.high_water_mark(table.name) - self.overlap, 0)
+        placeholders = ", ".join("?" for _ in table.columns)
+        insert_sql = f'INSERT INTO "{table.name}" VALUES ({placeholders})'
+        query = select(*table.columns).where(table.c.id > start).order_by(table.c.id)
+
+        copied = 0
+        self.connection.begin()
+        try:
+            self.connection.execute(f'DELETE FROM "{table.name}" WHERE id > ?', [start])
+            with self.postgres_engine.connect() as connection:
+                result = connection.execution_options(stream_results=True, yield_per=self.batch_size).execute(query)
+                for partition in result.partitions(self.batch_size):
+                    self.connection.executemany(insert_sql, [tuple(row) for row in partition])
+                    copied += len(partition)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        return copied
+
+    def sync(self) -> Dict[str, int]:
+        """
+        Copies rows added to Postgres since the last sync, including the overlap window.
+
+        Returns:
+        Dict[str, int]: The number of rows copied per table.
+        """
+        with self._sync_lock:
+            copied = {table.name: self._sync_table(table) for table in self.tables}
+            self.last_synced_at = time.monotonic()
+        logging.info(f"Analytics mirror synchronized: {copied}")
+        return copied
+
+    def seconds_since_sync(self) -> float:
+        if self.last_synced_at is None:
+            return math.inf
+        return time.monotonic() - self.last_synced_at
+
+    def run(self, sql: str) -> List[Dict[str, Any]]:
+        cursor = self.connection.cursor()
+        try:
+            return _fetch_dicts(cursor.execute(sql))
+        finally:
+            cursor.close()
+
+
+def _disable_external_access(connection) -> None:
+    """
+    Stops a DuckDB connection from touching the filesystem or network.
+
+    Queries come from the LLM, and DuckDB table functions such as ``read_text`` as well as
+    ``COPY``, ``ATTACH``, ``INSTALL`` and ``LOAD`` would otherwise read and write any file
+    the process can access. The configuration is locked so a query cannot turn it back on.
+    The connection's own database file remains writable.
+    """
+    connection.execute("SET enable_external_access = false")
+    connection.execute("SET lock_configuration = true")
+
+
+def _fetch_dicts(cursor) -> List[Dict[str, Any]]:
+    names = [description[0] for description in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def _duckdb_value_type(values: Sequence[Any]) -> str:
+    sample = next((value for value in values if value is not None), None)
+    if isinstance(sample, bool):
+        return "BOOLEAN"
+    if isinstance(sample, int):
+        return "BIGINT"
+    if isinstance(sample, (float, Decimal)):
+        return "DOUBLE"
+    if isinstance(sample, datetime):
+        return "TIMESTAMP"
+    if isinstance(sample, date):
+        return "DATE"
+    return "VARCHAR"
+
+
+def run_on_rows(sql: str, table_name: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Executes a query against rows already held in memory, loaded into a temporary DuckDB table.
+
+    The query runs with external access disabled, so it can only read the loaded rows,
+    and with integer division like Postgres.
+
+    Args:
+    sql (str): The SQL query to execute.
+    table_name (str): The table name the query uses for the rows.
+    rows (List[Dict[str, Any]]): The rows to query; must not be empty.
+
+    Returns:
+    List[Dict[str, Any]]: The result rows.
+
+    Raises:
+    ValueError: If the query is not a single read-only SELECT statement.
+    """
+    query = sql.strip().rstrip(';').strip()
+    if not query.lower().startswith(("select", "with")) or ';' in query or not is_safe_query(query):
+        raise ValueError("Only single read-only SELECT statements can run on the previous result.")
+
+    columns = list(rows[0].keys())
+    types = [_duckdb_value_type([row[column] for row in rows]) for column in columns]
+    connection = duckdb.connect()
+    try:
+        definition = ", ".join(f'"{column}" {column_type}' for column, column_type in zip(columns, types))
+        connection.execute(f'CREATE TABLE "{table_name}" ({definition})')
+        values = [
+            tuple(
+                str(row[column]) if column_type == "VARCHAR" and row[column] is not None else row[column]
+                for column, column_type in zip(columns, types)
+            )
+            for row in rows
+        ]
+        placeholders = ", ".join("?" for _ in columns)
+        connection.executemany(f'INSERT INTO "{table_name}" VALUES ({placeholders})', values)
+        connection.execute("SET integer_division = true")
+        _disable_external_access(connection)
+        return _fetch_dicts(connection.execute(query))
+    finally:
+        connection.close()
+
+
+def _values_match(left: Any, right: Any) -> bool:
+    if left is None or right is None:
+        return left is right
+    if isinstance(left, (int, float, Decimal)) and isinstance(right, (int, float, Decimal)):
+        return math.isclose(float(left), float(right), rel_tol=1e-6, abs_tol=1e-9)
+    if isinstance(left, date) and isinstance(right, date):
+        left_date = left.date() if isinstance(left, datetime) and left.time() == datetime.min.time() else left
+        right_date = right.date() if isinstance(right, datetime) and right.time() == datetime.min.time() else right
+        return left_date == right_date
+    return left == right
+
+
+def results_match(left: Sequence[Dict[str, Any]], right: Sequence[Dict[str, Any]], ordered: bool) -> bool:
+    """
+    Compares two query results, tolerating numeric type and rounding differences between engines.
+
+    Column names are ignored, since engines name unaliased expressions differently.
+
+    Args:
+    left (Sequence[Dict[str, Any]]): The rows returned by the first engine.
+    right (Sequence[Dict[str, Any]]): The rows returned by the second engine.
+    ordered (bool): Whether row order is significant.
+
+    Returns:
+    bool: True if both results contain the same rows.
+    """
+    if len(left) != len(right):
+        return False
+    left = [tuple(row.values()) for row in left]
+    right = [tuple(row.values()) for row in right]
+    if not ordered:
+        left = sorted(left, key=repr)
+        right = sorted(right, key=repr)
+    for left_row, right_row in zip(left, right):
+        if len(left_row) != len(right_row):
+            return False
+        if not all(_values_match(a, b) for a, b in zip(left_row, right_row)):
+            return False
+    return True
+
+
+class QueryRouter:
+    """
+    Sends read-only aggregate queries to the analytics mirror and everything else to Postgres.
+
+    A sample of mirrored queries is also executed on Postgres; on a mismatch the
+    Postgres result is returned, the mismatch is logged, and the query is sent to
+    Postgres from then on. The last ``MAX_MISMATCHED_QUERIES`` such queries are remembered.
+    """
+
+    def __init__(
+        self,
+        mirror: AnalyticsMirror,
+        postgres_engine: Engine,
+        verify_sample_rate: float = 0.1,
+        max_staleness: float = 60.0
+    ) -> None:
+        self.mirror = mirror
+        self.postgres_engine = postgres_engine
+        self.verify_sample_rate = verify_sample_rate
+        self.max_staleness = max_staleness
+        self.stats: Dict[str, int] = {"mirror": 0, "postgres": 0, "verified": 0, "mismatches": 0, "fallbacks": 0}
+        self._mismatched_queries: OrderedDict[str, None] = OrderedDict()
+        self._mismatch_lock = threading.Lock()
+
+    @staticmethod
+    def _query_key(sql: str) -> str:
+        return " ".join(sql.split())
+
+    def _mark_mismatched(self, sql: str) -> None:
+        with self._mismatch_lock:
+            self._mismatched_queries[self._query_key(sql)] = None
+            self._mismatched_queries.move_to_end(self._query_key(sql))
+            while len(self._mismatched_queries) > MAX_MISMATCHED_QUERIES:
+                self._mismatched_queries.popitem(last=False)
+
+    def is_mirror_query(self, sql: str) -> bool:
+        """
+        Checks whether the query is a read-only aggregate that is not a point lookup
+        and has not produced a result different from Postgres before.
+        """
+        query = sql.strip()
+        if not query.lower().startswith(("select", "with")) or not is_safe_query(query):
+            return False
+        if not AGGREGATE_PATTERN.search(query) or POINT_LOOKUP_PATTERN.search(query):
+            return False
+        with self._mismatch_lock:
+            return self._query_key(query) not in self._mismatched_queries
+
+    def _run_postgres(self, sql: str) -> List[Dict[str, Any]]:
+        with self.postgres_engine.connect() as connection:
+            return [row._asdict() for row in connection.execute(text(sql))]
+
+    def run(self, sql: str) -> List[Dict[str, Any]]:
+        """
+        Executes the query on the engine chosen for it.
+
+        Args:
+        sql (str): The SQL query to execute.
+
+        Returns:
+        List[Dict[str, Any]]: The result rows.
+        """
+        if not self.is_mirror_query(sql):
+            self.stats["postgres"] += 1
+            return self._run_postgres(sql)
+
+        try:
+            if self.mirror.seconds_since_sync() > self.max_staleness:
+                self.mirror.sync()
+            mirror_rows = self.mirror.run(sql)
+        except Exception as e:
+            logging.warning(f"Analytics mirror failed, falling back to Postgres: {str(e)}")
+            self.stats["fallbacks"] += 1
+            return self._run_postgres(sql)
+
+        self.stats["mirror"] += 1
+        if random.random() >= self.verify_sample_rate:
+            return mirror_rows
+
+        postgres_rows = self._run_postgres(sql)
+        self.stats["verified"] += 1
+        if not results_match(mirror_rows, postgres_rows, ordered=bool(ORDER_BY_PATTERN.search(sql))):
+            self.stats["mismatches"] += 1
+            self._mark_mismatched(sql)
+            logging.warning(f"Analytics mirror result differs from Postgres, routing the query to Postgres: {sql}")
+            return postgres_rows
+        return mirror_rows
+
+
+@lru_cache(maxsize=1)
+def get_query_router() -> Optional[QueryRouter]:
+    """
+    Returns the process-wide query router, or None if the analytics mirror is not configured.
+
+    The mirror is enabled by setting ANALYTICS_MIRROR_PATH to a DuckDB file path or ":memory:".
+    ANALYTICS_MIRROR_VERIFY_RATE and ANALYTICS_MIRROR_MAX_STALENESS tune result verification and sync frequency.
+    A DuckDB file can only be opened by one process at a time, so with a file path
+    every worker but the first runs without the mirror.
+
+    Returns:
+    Optional[QueryRouter]: The configured router, or None.
+    """
+    mirror_path = os.getenv('ANALYTICS_MIRROR_PATH')
+    if not mirror_path:
+        return None
+
+    postgres_engine = create_engine(get_db_connection_string())
+    try:
+        mirror = AnalyticsMirror(postgres_engine, mirror_path)
+    except duckdb.Error as e:
+        logging.error(f"Could not open the analytics mirror, queries will run on Postgres: {str(e)}")
+        return None
+
+    return QueryRouter(
+        mirror,
+        postgres_engine,
+        verify_sample_rate=float(os.getenv('ANALYTICS_MIRROR_VERIFY_RATE', '0.1')),
+        max_staleness=float(os.getenv('ANALYTICS_MIRROR_MAX_STALENESS', '60')),
+    )
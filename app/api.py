@@ -1,8 +1,18 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+import logging
+from contextlib import contextmanager
+from typing import Iterator, Literal, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, model_validator
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.background import BackgroundTask
 
 from app.agents.chain_agent import ChainSQLAgent
-from app.agents.graph_agent import GraphSQLAgent
+from app.agents.graph_agent import get_graph_agent
+from app.analytics import get_query_router
+from app.concurrency import AdmissionRejected, Priority, ResourceLimiter, get_governor
+from app.export import MEDIA_TYPES, ExportError, sign_export_query, stream_export, verify_export_signature
 from app.utils import get_db_connection_string
 
 
@@ -11,22 +21,109 @@ app = FastAPI()
 
 class QueryRequest(BaseModel):
     query: str
+    session_id: Optional[str] = None
+    priority: Literal["interactive", "batch"] = "interactive"
 
 
 class QueryResponse(BaseModel):
     result: str
     raw_sql: str
+    sql_signature: Optional[str] = None
+    session_id: Optional[str] = None
+
+
+class ExportRequest(BaseModel):
+    query: Optional[str] = None
+    sql: Optional[str] = None
+    sql_signature: Optional[str] = None
+    format: Literal["csv", "ndjson", "arrow", "parquet"] = "csv"
+    priority: Literal["interactive", "batch"] = "batch"
+
+    @model_validator(mode="after")
+    def check_query_or_sql(self) -> "ExportRequest":
+        if bool(self.query) == bool(self.sql):
+            raise ValueError("Exactly one of 'query' or 'sql' must be provided")
+        return self
+
+
+@contextmanager
+def admission_control(priority: str, *limiters: ResourceLimiter) -> Iterator[None]:
+    """
+    Runs the request under the concurrency governor and turns rejections into 429/503 responses.
+
+    Args:
+    priority (str): "interactive" or "batch".
+    limiters (ResourceLimiter): The limiters whose full queues reject the request up front.
+
+    Raises:
+    HTTPException: If the governor rejects the request.
+    """
+    governor = get_governor()
+    try:
+        with governor.admit(Priority[priority.upper()], *limiters):
+            yield
+    except AdmissionRejected as e:
+        logging.warning(f"Request rejected: {str(e)}")
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
 
 @app.post("/chain_query", response_model=QueryResponse)
 def process_chain_query(request: QueryRequest):
-    agent = ChainSQLAgent(get_db_connection_string())
-    result, raw_sql = agent.query(request.query)
-    return QueryResponse(result=result, raw_sql=raw_sql)
+    governor = get_governor()
+    with admission_control(request.priority, governor.llm, governor.db):
+        agent = ChainSQLAgent(
+            get_db_connection_string(),
+            query_router=get_query_router(),
+            governor=governor
+        )
+        result, raw_sql = agent.query(request.query)
+    return QueryResponse(result=result, raw_sql=raw_sql, sql_signature=sign_export_query(raw_sql))
 
 
 @app.post("/graph_query", response_model=QueryResponse)
 def process_graph_query(request: QueryRequest):
-    agent = GraphSQLAgent(get_db_connection_string())
-    result, raw_sql = agent.query(request.query)
-    return QueryResponse(result=result, raw_sql=raw_sql)
+    governor = get_governor()
+    with admission_control(request.priority, governor.llm, governor.db):
+        result, raw_sql = get_graph_agent().query(request.query, session_id=request.session_id)
+    return QueryResponse(
+        result=result,
+        raw_sql=raw_sql,
+        sql_signature=sign_export_query(raw_sql),
+        session_id=request.session_id
+    )
+
+
+@app.post("/export")
+def process_export(request: ExportRequest):
+    if request.sql:
+        try:
+            verify_export_signature(request.sql, request.sql_signature)
+        except ExportError as e:
+            raise HTTPException(status_code=403, detail=str(e))
+
+    governor = get_governor()
+    limiters = (governor.llm, governor.export) if request.query else (governor.export,)
+    with admission_control(request.priority, *limiters):
+        sql = request.sql
+        if request.query:
+            agent = get_graph_agent()
+            sql = agent.generate_sql(request.query)
+            if not sql:
+                raise HTTPException(status_code=400, detail=agent.messages["GRAPH_ERROR_MESSAGE"])
+
+        try:
+            chunks, close_stream = stream_export(sql, request.format, limiter=governor.export)
+        except ExportError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except SQLAlchemyError as e:
+            logging.error(f"Export query failed: {str(e)}")
+            raise HTTPException(status_code=400, detail="The query could not be executed.")
+
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[request.format],
+        headers={
+            "Content-Disposition": f'attachment; filename="export.{request.format}"',
+        },
+        background=BackgroundTask(close_stream),
+    )
@@ -0,0 +1,186 @@
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+_current_priority: ContextVar[Priority] = ContextVar("current_priority", default=Priority.INTERACTIVE)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a resource slot cannot be granted.
+
+    ``status_code`` is 429 when the wait queue is full and 503 when the deadline
+    passed while waiting; ``retry_after`` is the suggested delay in seconds.
+    """
+
+    def __init__(self, resource: str, status_code: int, retry_after: int) -> None:
+        reason = "wait queue is full" if status_code == 429 else "timed out waiting for capacity"
+        super().__init__(f"The {resource} {reason}.")
+        self.resource = resource
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class ResourceLimiter:
+    """
+    Semaphore with a bounded, priority-ordered wait queue and per-acquire deadlines.
+
+    Waiters are admitted in priority order and first come, first served within a
+    priority, so batch callers only get a slot when no interactive caller is waiting.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, timeout: float) -> None:
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiters: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._average_hold = 1.0
+
+    def retry_after(self) -> int:
+        """
+        Estimates how many seconds it takes for the current queue to drain.
+        """
+        return max(1, math.ceil(self._average_hold * (len(self._waiters) + 1) / self.max_concurrency))
+
+    def check(self) -> None:
+        """
+        Rejects immediately if no slot is free and the wait queue is full, without taking a slot.
+
+        Raises:
+        AdmissionRejected: If the wait queue is full.
+        """
+        with self._condition:
+            if self._active >= self.max_concurrency and len(self._waiters) >= self.max_queue:
+                raise AdmissionRejected(self.name, 429, self.retry_after())
+
+    def acquire(self, priority: Optional[Priority] = None, timeout: Optional[float] = None) -> None:
+        """
+        Takes a slot, waiting in the queue until one is free or the deadline passes.
+
+        Args:
+        priority (Optional[Priority]): The caller's priority; defaults to the priority of the current request.
+        timeout (Optional[float]): Maximum seconds to wait; defaults to the limiter timeout.
+
+        Raises:
+        AdmissionRejected: If the wait queue is full or the deadline passes.
+        """
+        priority = _current_priority.get() if priority is None else priority
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._condition:
+            if self._active < self.max_concurrency and not self._waiters:
+                self._active += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                raise AdmissionRejected(self.name, 429, self.retry_after())
+
+            entry = (int(priority), next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while self._active >= self.max_concurrency or self._waiters[0] != entry:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise AdmissionRejected(self.name, 503, self.retry_after())
+                    self._condition.wait(remaining)
+                heapq.heappop(self._waiters)
+                self._active += 1
+            except AdmissionRejected:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                raise
+            finally:
+                self._condition.notify_all()
+
+    def release(self, held_for: Optional[float] = None) -> None:
+        """
+        Returns a slot and wakes up the waiters.
+
+        Args:
+        held_for (Optional[float]): How long the slot was held, used to estimate Retry-After.
+        """
+        with self._condition:
+            self._active -= 1
+            if held_for is not None:
+                self._average_hold = 0.8 * self._average_hold + 0.2 * held_for
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, priority: Optional[Priority] = None) -> Iterator[None]:
+        self.acquire(priority)
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started_at)
+
+
+class ConcurrencyGovernor:
+    """
+    Limits concurrent LLM calls, database executions and exports across all agents in the process.
+
+    Exports have their own limiter since they hold a connection from their own engine
+    for as long as the client downloads, and must not starve the agents' queries.
+    """
+
+    def __init__(self, llm: ResourceLimiter, db: ResourceLimiter, export: ResourceLimiter) -> None:
+        self.llm = llm
+        self.db = db
+        self.export = export
+
+    @contextmanager
+    def admit(self, priority: Priority, *limiters: ResourceLimiter) -> Iterator[None]:
+        """
+        Runs a request at the given priority, rejecting it up front if any of the limiters' queues is full.
+
+        Args:
+        priority (Priority): The priority used for every slot the request acquires.
+        limiters (ResourceLimiter): The limiters checked before the request starts.
+
+        Raises:
+        AdmissionRejected: If a wait queue is full.
+        """
+        for limiter in limiters:
+            limiter.check()
+        token = _current_priority.set(priority)
+        try:
+            yield
+        finally:
+            _current_priority.reset(token)
+
+
+@lru_cache(maxsize=1)
+def get_governor() -> ConcurrencyGovernor:
+    """
+    Returns the process-wide concurrency governor.
+
+    LLM_MAX_CONCURRENCY, DB_MAX_CONCURRENCY and EXPORT_MAX_CONCURRENCY set the number of concurrent calls,
+    ADMISSION_MAX_QUEUE the number of waiting callers per resource, and
+    ADMISSION_TIMEOUT the maximum number of seconds a caller waits for a slot.
+
+    Returns:
+    ConcurrencyGovernor: The configured governor.
+    """
+    max_queue = int(os.getenv('ADMISSION_MAX_QUEUE', '32'))
+    timeout = float(os.getenv('ADMISSION_TIMEOUT', '10'))
+    return ConcurrencyGovernor(
+        llm=ResourceLimiter("LLM", int(os.getenv('LLM_MAX_CONCURRENCY', '8')), max_queue, timeout),
+        db=ResourceLimiter("database", int(os.getenv('DB_MAX_CONCURRENCY', '5')), max_queue, timeout),
+        export=ResourceLimiter("export", int(os.getenv('EXPORT_MAX_CONCURRENCY', '2')), max_queue, timeout),
+    )
@@ -0,0 +1,374 @@
+import csv
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Engine, create_engine, text
+
+from app.agents.agent import is_safe_query
+from app.concurrency import ResourceLimiter
+from app.utils import get_db_connection_string
+
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_STATEMENT_TIMEOUT = 300.0
+
+MEDIA_TYPES: Dict[str, str] = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ExportError(ValueError):
+    """Raised when a query cannot be exported."""
+
+
+class ExportColumn(NamedTuple):
+    """
+    A result column with the precision and scale the database reports for it, if any.
+    """
+
+    name: str
+    precision: Optional[int] = None
+    scale: Optional[int] = None
+
+
+@lru_cache(maxsize=1)
+def get_export_engine() -> Engine:
+    """
+    Returns the engine used for exports, created once per process.
+
+    Returns:
+    Engine: A SQLAlchemy engine bound to the application database.
+    """
+    return create_engine(get_db_connection_string())
+
+
+def _signing_key() -> Optional[bytes]:
+    key = os.getenv('EXPORT_SIGNING_KEY')
+    return key.encode('utf-8') if key else None
+
+
+def sign_export_query(sql: str) -> Optional[str]:
+    """
+    Signs SQL produced by an agent so that it can later be exported as is.
+
+    Args:
+    sql (str): The SQL query to sign.
+
+    Returns:
+    Optional[str]: The hex signature, or None if EXPORT_SIGNING_KEY is not set or there is no query.
+    """
+    key = _signing_key()
+    if key is None or not sql:
+        return None
+    return hmac.new(key, sql.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def verify_export_signature(sql: str, signature: Optional[str]) -> None:
+    """
+    Checks that the SQL was produced by an agent of this deployment.
+
+    Args:
+    sql (str): The SQL query to export.
+    signature (Optional[str]): The signature returned with the query's answer.
+
+    Raises:
+    ExportError: If SQL exports are disabled or the signature does not match.
+    """
+    expected = sign_export_query(sql)
+    if expected is None:
+        raise ExportError("Exporting SQL is disabled; set EXPORT_SIGNING_KEY to enable it.")
+    if signature is None or not hmac.compare_digest(expected, signature):
+        raise ExportError("Only SQL returned by the query endpoints can be exported.")
+
+
+def validate_export_query(sql: str) -> str:
+    """
+    Validates that the SQL is a single read-only statement.
+
+    Args:
+    sql (str): The SQL query to validate.
+
+    Returns:
+    str: The query with surrounding whitespace and trailing semicolon removed.
+
+    Raises:
+    ExportError: If the query is not a single read-only SELECT statement.
+    """
+    query = sql.strip().rstrip(';').strip()
+    if not query.lower().startswith(("select", "with")):
+        raise ExportError("Only SELECT statements can be exported.")
+    if ';' in query or not is_safe_query(query):
+        raise ExportError("The query contains potentially unsafe operations and cannot be exported.")
+    return query
+
+
+class QueryResultStream:
+    """
+    Reads query results from a server-side cursor in fixed-size batches.
+
+    The connection is opened by ``open`` so that column names are known before the
+    response starts, and is closed once ``batches`` is exhausted or ``close`` is called.
+    Each statement, including every fetch from the cursor, is cancelled by Postgres
+    after ``statement_timeout`` seconds.
+    Callers must call ``close`` unconditionally, since ``batches`` never runs if the
+    client disconnects before the first chunk. When a limiter is given, a slot is held
+    for the whole lifetime of the connection, including a slow client's download.
+    """
+
+    def __init__(
+        self,
+        sql: str,
+        engine: Engine | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        limiter: Optional[ResourceLimiter] = None,
+        statement_timeout: float = DEFAULT_STATEMENT_TIMEOUT
+    ) -> None:
+        self.sql = sql
+        self.engine = engine or get_export_engine()
+        self.batch_size = batch_size
+        self.limiter = limiter
+        self.statement_timeout = statement_timeout
+        self.columns: List[ExportColumn] = []
+        self._connection = None
+        self._result = None
+        self._acquired_at: Optional[float] = None
+        self._close_lock = threading.Lock()
+
+    def open(self) -> "QueryResultStream":
+        if self.limiter is not None:
+            self.limiter.acquire()
+            self._acquired_at = time.monotonic()
+        try:
+            # Only the query itself may use a server-side cursor: psycopg2 declares a
+            # cursor for every statement sent through one, which fails for SET.
+            self._connection = self.engine.connect()
+            self._connection.execute(text("SET TRANSACTION READ ONLY"))
+            self._connection.execute(text(f"SET LOCAL statement_timeout = {int(self.statement_timeout * 1000)}"))
+            self._result = self._connection.execute(
+                text(self.sql),
+                execution_options={"stream_results": True, "yield_per": self.batch_size},
+            )
+            self.columns = [
+                ExportColumn(column[0], column[4], column[5]) for column in self._result.cursor.description
+            ]
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def batches(self) -> Iterator[Sequence[Sequence[Any]]]:
+        try:
+            for partition in self._result.partitions(self.batch_size):
+                yield partition
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Closes the connection and releases the limiter slot. Safe to call more than once.
+        """
+        with self._close_lock:
+            connection, self._connection = self._connection, None
+            acquired_at, self._acquired_at = self._acquired_at, None
+        try:
+            if connection is not None:
+                connection.rollback()
+                connection.close()
+        finally:
+            if acquired_at is not None:
+                self.limiter.release(time.monotonic() - acquired_at)
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """
+    Write-only sink that hands out written bytes chunk by chunk.
+
+    ``tell`` reports the total number of bytes written so that writers which record
+    absolute offsets (the Parquet footer) stay correct after the buffer is drained.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _json_default(value: Any) -> str:
+    return str(value)
+
+
+def write_csv(columns: List[ExportColumn], batches: Iterator[Sequence[Sequence[Any]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in columns])
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+    remaining = buffer.getvalue()
+    if remaining:
+        yield remaining.encode('utf-8')
+
+
+def write_ndjson(columns: List[ExportColumn], batches: Iterator[Sequence[Sequence[Any]]]) -> Iterator[bytes]:
+    names = [column.name for column in columns]
+    for batch in batches:
+        lines = [json.dumps(dict(zip(names, row)), default=_json_default) for row in batch]
+        yield ("\n".join(lines) + "\n").encode('utf-8')
+
+
+def _widen_type(arrow_type, column: ExportColumn):
+    """
+    Widens a type inferred from the first batch so that later batches still fit it.
+
+    Decimals take their precision and scale from the database rather than from the
+    first values. Unconstrained ``numeric`` values, such as the result of ``AVG`` or
+    a division, can have a different scale on every row and are written as strings.
+    """
+    if pa.types.is_decimal(arrow_type):
+        if column.precision is None or column.scale is None or column.precision > 76:
+            return pa.string()
+        if column.precision > 38:
+            return pa.decimal256(column.precision, column.scale)
+        return pa.decimal128(column.precision, column.scale)
+    if pa.types.is_null(arrow_type):
+        return pa.string()
+    return arrow_type
+
+
+def _to_record_batch(columns: List[ExportColumn], batch: Sequence[Sequence[Any]], schema=None):
+    arrays = [list(column) for column in zip(*batch)] if batch else [[] for _ in columns]
+    if schema is None:
+        inferred = [pa.array(values) for values in arrays]
+        schema = pa.schema([
+            (column.name, _widen_type(array.type, column)) for column, array in zip(columns, inferred)
+        ])
+    converted = []
+    for values, field in zip(arrays, schema):
+        if pa.types.is_string(field.type):
+            values = [None if value is None else str(value) for value in values]
+        converted.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(converted, schema=schema)
+
+
+def _write_arrow_format(
+    columns: List[ExportColumn],
+    batches: Iterator[Sequence[Sequence[Any]]],
+    open_writer: Callable[[Any, Any], Any],
+    write_batch: Callable[[Any, Any], None],
+) -> Iterator[bytes]:
+    sink = _ChunkBuffer()
+    writer = None
+    schema = None
+    for batch in batches:
+        record_batch = _to_record_batch(columns, batch, schema)
+        if writer is None:
+            schema = record_batch.schema
+            writer = open_writer(sink, schema)
+        write_batch(writer, record_batch)
+        yield sink.drain()
+    if writer is None:
+        schema = pa.schema([(column.name, pa.null()) for column in columns])
+        writer = open_writer(sink, schema)
+    writer.close()
+    yield sink.drain()
+
+
+def write_arrow(columns: List[ExportColumn], batches: Iterator[Sequence[Sequence[Any]]]) -> Iterator[bytes]:
+    return _write_arrow_format(
+        columns,
+        batches,
+        lambda sink, schema: pa.ipc.new_stream(sink, schema),
+        lambda writer, record_batch: writer.write_batch(record_batch),
+    )
+
+
+def write_parquet(columns: List[ExportColumn], batches: Iterator[Sequence[Sequence[Any]]]) -> Iterator[bytes]:
+    return _write_arrow_format(
+        columns,
+        batches,
+        lambda sink, schema: pq.ParquetWriter(sink, schema),
+        lambda writer, record_batch: writer.write_batch(record_batch),
+    )
+
+
+WRITERS: Dict[str, Callable[[List[ExportColumn], Iterator[Sequence[Sequence[Any]]]], Iterator[bytes]]] = {
+    "csv": write_csv,
+    "ndjson": write_ndjson,
+    "arrow": write_arrow,
+    "parquet": write_parquet,
+}
+
+
+def stream_export(
+    sql: str,
+    export_format: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    limiter: Optional[ResourceLimiter] = None
+) -> Tuple[Iterator[bytes], Callable[[], None]]:
+    """
+    Executes a validated query and returns an iterator of encoded chunks with a function that closes the stream.
+
+    The query is executed before this function returns, so database errors surface
+    before the response headers are sent. Memory use is bounded by ``batch_size``,
+    and EXPORT_STATEMENT_TIMEOUT limits the seconds each database statement may run.
+    The close function must be called once the response is finished, whether or not
+    the chunks were consumed, to release the connection and the limiter slot.
+
+    Args:
+    sql (str): The SQL query to export.
+    export_format (str): One of the keys of ``WRITERS``.
+    batch_size (int): The number of rows fetched from the cursor per chunk.
+    limiter (Optional[ResourceLimiter]): Limits concurrent exports when set.
+
+    Returns:
+    Tuple[Iterator[bytes], Callable[[], None]]: The encoded result, chunk by chunk, and the close function.
+
+    Raises:
+    ExportError: If the query is not exportable or the format is not supported.
+    AdmissionRejected: If no export slot is available.
+    """
+    if export_format not in WRITERS:
+        raise ExportError(f"Unsupported export format: {export_format}")
+    query = validate_export_query(sql)
+
+    statement_timeout = float(os.getenv('EXPORT_STATEMENT_TIMEOUT', str(DEFAULT_STATEMENT_TIMEOUT)))
+    stream = QueryResultStream(
+        query,
+        batch_size=batch_size,
+        limiter=limiter,
+        statement_timeout=statement_timeout
+    ).open()
+    logging.info(f"Exporting query as {export_format}: {query}")
+    return WRITERS[export_format](stream.columns, stream.batches()), stream.close
@@ -0,0 +1,119 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_SESSION_TTL = 3600.0
+DEFAULT_MAX_CHECKPOINTS = 2
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    In-memory checkpointer that keeps a bounded number of sessions.
+
+    Sessions are evicted least recently used first once ``max_sessions`` is reached,
+    and expire ``session_ttl`` seconds after their last checkpoint. Only the latest
+    ``max_checkpoints`` checkpoints of each session are kept.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        session_ttl: float = DEFAULT_SESSION_TTL,
+        max_checkpoints: int = DEFAULT_MAX_CHECKPOINTS
+    ) -> None:
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.max_checkpoints = max_checkpoints
+        self._session_access: OrderedDict[str, float] = OrderedDict()
+        self._eviction_lock = threading.Lock()
+
+    def delete_session(self, thread_id: str) -> None:
+        self.storage.pop(thread_id, None)
+        for key in [key for key in self.writes if key[0] == thread_id]:
+            del self.writes[key]
+        self._session_access.pop(thread_id, None)
+
+    def _is_expired(self, thread_id: str) -> bool:
+        accessed_at = self._session_access.get(thread_id)
+        return accessed_at is not None and time.monotonic() - accessed_at > self.session_ttl
+
+    def _trim_checkpoints(self, thread_id: str, checkpoint_ns: str) -> None:
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        for checkpoint_id in sorted(checkpoints)[:-self.max_checkpoints]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+    def _evict_sessions(self) -> None:
+        while self._session_access:
+            thread_id = next(iter(self._session_access))
+            if len(self._session_access) <= self.max_sessions and not self._is_expired(thread_id):
+                break
+            logging.info(f"Evicting session {thread_id}")
+            self.delete_session(thread_id)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._eviction_lock:
+            if self._is_expired(thread_id):
+                self.delete_session(thread_id)
+                return None
+            if thread_id not in self.storage:
+                return None
+        return super().get_tuple(config)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        with self._eviction_lock:
+            self._trim_checkpoints(thread_id, config["configurable"]["checkpoint_ns"])
+            self._session_access[thread_id] = time.monotonic()
+            self._session_access.move_to_end(thread_id)
+            self._evict_sessions()
+        return saved_config
+
+
+@lru_cache(maxsize=1)
+def get_session_checkpointer() -> BaseCheckpointSaver:
+    """
+    Returns the process-wide checkpointer that stores GraphSQLAgent sessions.
+
+    SESSION_BACKEND selects "memory" (default) or "sqlite"; the SQLite file is set with SESSION_SQLITE_PATH.
+    SESSION_MAX_SESSIONS and SESSION_TTL bound the number of sessions and their lifetime in seconds.
+
+    Returns:
+    BaseCheckpointSaver: The configured checkpointer.
+
+    Raises:
+    ValueError: If SESSION_BACKEND is not a supported backend.
+    """
+    backend = os.getenv('SESSION_BACKEND', 'memory')
+    max_sessions = int(os.getenv('SESSION_MAX_SESSIONS', str(DEFAULT_MAX_SESSIONS)))
+    session_ttl = float(os.getenv('SESSION_TTL', str(DEFAULT_SESSION_TTL)))
+
+    if backend == 'memory':
+        return BoundedMemorySaver(max_sessions, session_ttl)
+    if backend == 'sqlite':
+        from app.sessions_sqlite import create_sqlite_checkpointer
+
+        sqlite_path = os.getenv('SESSION_SQLITE_PATH', 'sessions.sqlite')
+        return create_sqlite_checkpointer(sqlite_path, max_sessions, session_ttl)
+    raise ValueError(f"Unsupported SESSION_BACKEND: {backend}")
@@ -0,0 +1,120 @@
+import logging
+import sqlite3
+import time
+from typing import Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from app.sessions import DEFAULT_MAX_CHECKPOINTS, DEFAULT_MAX_SESSIONS, DEFAULT_SESSION_TTL
+
+
+class BoundedSqliteSaver(SqliteSaver):
+    """
+    SQLite checkpointer that keeps a bounded number of sessions.
+
+    Last access times are stored in a ``sessions`` table next to the checkpoints, so
+    eviction works across worker processes sharing the same database file.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        session_ttl: float = DEFAULT_SESSION_TTL,
+        max_checkpoints: int = DEFAULT_MAX_CHECKPOINTS
+    ) -> None:
+        super().__init__(conn)
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.max_checkpoints = max_checkpoints
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (thread_id TEXT PRIMARY KEY, accessed_at REAL NOT NULL)"
+        )
+
+    def _delete_sessions(self, cur: sqlite3.Cursor, thread_ids: list[str]) -> None:
+        for thread_id in thread_ids:
+            logging.info(f"Evicting session {thread_id}")
+            cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            cur.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            cur.execute("DELETE FROM sessions WHERE thread_id = ?", (thread_id,))
+
+    def delete_session(self, thread_id: str) -> None:
+        with self.cursor() as cur:
+            self._delete_sessions(cur, [thread_id])
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT thread_id FROM sessions WHERE thread_id = ? AND accessed_at < ?",
+                (thread_id, time.time() - self.session_ttl),
+            )
+            if cur.fetchone():
+                self._delete_sessions(cur, [thread_id])
+                return None
+        return super().get_tuple(config)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self.cursor() as cur:
+            stale_checkpoints = (
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?"
+            )
+            params = (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.max_checkpoints)
+            cur.execute(
+                f"DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+                f"AND checkpoint_id IN ({stale_checkpoints})",
+                params,
+            )
+            cur.execute(
+                f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                f"AND checkpoint_id IN ({stale_checkpoints})",
+                params,
+            )
+            cur.execute(
+                "INSERT OR REPLACE INTO sessions (thread_id, accessed_at) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            cur.execute(
+                "SELECT thread_id FROM sessions WHERE accessed_at < ? "
+                "UNION SELECT thread_id FROM "
+                "(SELECT thread_id FROM sessions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (time.time() - self.session_ttl, self.max_sessions),
+            )
+            self._delete_sessions(cur, [row[0] for row in cur.fetchall()])
+        return saved_config
+
+
+def create_sqlite_checkpointer(
+    path: str,
+    max_sessions: int = DEFAULT_MAX_SESSIONS,
+    session_ttl: float = DEFAULT_SESSION_TTL
+) -> BoundedSqliteSaver:
+    """
+    Creates a bounded SQLite checkpointer that can be shared between threads.
+
+    Args:
+    path (str): The SQLite database file.
+    max_sessions (int): The maximum number of sessions kept.
+    session_ttl (float): Seconds after the last checkpoint before a session expires.
+
+    Returns:
+    BoundedSqliteSaver: The checkpointer.
+    """
+    return BoundedSqliteSaver(sqlite3.connect(path, check_same_thread=False), max_sessions, session_ttl)
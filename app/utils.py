@@ -10,6 +10,9 @@ def get_db_connection_string() -> str:
     """
     Generates and returns a database connection string using environment variables.
 
+    DB_CONNECT_TIMEOUT sets how many seconds connecting may take (default 10), so an
+    unreachable database fails fast instead of hanging a worker.
+
     Returns:
     str: A formatted database connection string.
 
@@ -32,8 +35,10 @@ def get_db_connection_string() -> str:
     # URL encode the password to handle special characters
     encoded_pass = quote_plus(db_pass)
 
+    connect_timeout = int(os.getenv('DB_CONNECT_TIMEOUT', '10'))
+
     # Construct and return the connection string
-    return f'postgresql://{db_user}:{encoded_pass}@{db_host}/{db_name}'
+    return f'postgresql://{db_user}:{encoded_pass}@{db_host}/{db_name}?connect_timeout={connect_timeout}'
 
 
 def load_json_file(file_path: Path) -> Dict[str, Any]:
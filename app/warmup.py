@@ -0,0 +1,112 @@
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import List
+
+
+# Modules imported lazily by LangChain, OpenAI and SQLAlchemy on the first request.
+HEAVY_MODULES: tuple[str, ...] = (
+    "app.main",
+    "openai",
+    "psycopg2",
+    "sqlalchemy.dialects.postgresql.psycopg2",
+    "langchain.chains.sql_database.query",
+    "langchain_core.language_models.chat_models",
+    "langchain_core.prompts.chat",
+    "langgraph.checkpoint.memory",
+    "langgraph.pregel",
+)
+
+
+def import_heavy_modules() -> float:
+    """
+    Imports the application and the modules it would otherwise import on the first request.
+
+    Safe to call before forking workers: it only imports modules and opens no connections.
+
+    Returns:
+    float: The time spent importing, in seconds.
+    """
+    started_at = time.perf_counter()
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+    return time.perf_counter() - started_at
+
+
+def worker_configuration_warnings(workers: int) -> List[str]:
+    """
+    Lists settings that behave differently once requests are spread over several worker processes.
+
+    Args:
+    workers (int): The number of worker processes.
+
+    Returns:
+    List[str]: One message per problematic setting; empty for a single worker.
+    """
+    if workers <= 1:
+        return []
+
+    warnings = []
+    if os.getenv('SESSION_BACKEND', 'memory') == 'memory':
+        warnings.append(
+            f"SESSION_BACKEND=memory keeps sessions inside each of the {workers} workers, so a follow-up question "
+            f"served by another worker starts a new session; set SESSION_BACKEND=sqlite to share them"
+        )
+    mirror_path = os.getenv('ANALYTICS_MIRROR_PATH')
+    if mirror_path and mirror_path != ':memory:':
+        warnings.append(
+            f"ANALYTICS_MIRROR_PATH={mirror_path} can only be opened by one of the {workers} workers, "
+            f"the others send every query to Postgres; use :memory: for a mirror per worker"
+        )
+    warnings.append(
+        f"LLM_MAX_CONCURRENCY, DB_MAX_CONCURRENCY and EXPORT_MAX_CONCURRENCY apply to each of the {workers} workers, "
+        f"so the limits for the whole server are {workers} times higher"
+    )
+    return warnings
+
+
+def _sync_mirror(query_router) -> None:
+    try:
+        query_router.mirror.sync()
+    except Exception as e:
+        logging.warning(f"Analytics mirror sync failed during warm-up: {str(e)}")
+
+
+def warm_up() -> float:
+    """
+    Creates the per-process resources used by the first request.
+
+    It connects to the database, caches the schema description and compiles the agent
+    graph. The analytics mirror, if one is configured, is synchronized in a background
+    thread, since a full copy can take longer than Gunicorn's worker timeout. Must run
+    after forking, since the created connections cannot be shared between processes.
+    Failures are logged and leave the initialization to the first request; connecting
+    is bounded by DB_CONNECT_TIMEOUT.
+
+    Returns:
+    float: The time spent warming up, in seconds.
+    """
+    from app.agents.agent import get_sql_database, get_table_info
+    from app.agents.graph_agent import get_graph_agent
+    from app.analytics import get_query_router
+    from app.utils import get_db_connection_string
+
+    started_at = time.perf_counter()
+    try:
+        db_url = get_db_connection_string()
+        get_sql_database(db_url).run("SELECT 1")
+        get_table_info(db_url)
+
+        query_router = get_query_router()
+        if query_router is not None:
+            threading.Thread(target=_sync_mirror, args=(query_router,), name="mirror-sync", daemon=True).start()
+
+        get_graph_agent()
+    except Exception as e:
+        logging.warning(f"Warm-up failed, the first request will initialize the worker: {str(e)}")
+
+    elapsed = time.perf_counter() - started_at
+    logging.info(f"Warm-up finished in {elapsed:.2f}s")
+    return elapsed
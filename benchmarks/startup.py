@@ -0,0 +1,79 @@
+"""
+Measures worker startup cost: importing the application, warming it up, and the latency of the first requests.
+
+Each run starts a fresh Python process, so the numbers include everything a new Gunicorn worker pays.
+
+Usage:
+    python -m benchmarks.startup [--runs 3] [--endpoint /graph_query] [--query "How many orders are there?"]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+def run_child(endpoint: str, query: str, warm: bool) -> dict:
+    """
+    Runs inside a fresh process: imports the application, optionally warms it up and sends two requests.
+    """
+    started_at = time.perf_counter()
+    from app.warmup import import_heavy_modules, warm_up
+    import_heavy_modules()
+    timings = {"import": time.perf_counter() - started_at}
+
+    timings["warm_up"] = warm_up() if warm else 0.0
+
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    client = TestClient(app, raise_server_exceptions=False)
+    for name in ("first_request", "second_request"):
+        request_started_at = time.perf_counter()
+        response = client.post(endpoint, json={"query": query})
+        timings[name] = time.perf_counter() - request_started_at
+        timings[f"{name}_status"] = response.status_code
+    return timings
+
+
+def measure(endpoint: str, query: str, warm: bool, runs: int) -> list[dict]:
+    command = [sys.executable, "-m", "benchmarks.startup", "--child", "--endpoint", endpoint, "--query", query]
+    if warm:
+        command.append("--warm")
+
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def print_report(label: str, results: list[dict]) -> None:
+    print(f"{label} ({len(results)} runs, median seconds)")
+    for name in ("import", "warm_up", "first_request", "second_request"):
+        print(f"  {name:<16}{statistics.median(result[name] for result in results):8.3f}")
+    statuses = sorted({result["first_request_status"] for result in results})
+    print(f"  first request status codes: {statuses}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--endpoint", default="/graph_query")
+    parser.add_argument("--query", default="How many orders are there?")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--warm", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.endpoint, args.query, args.warm)))
+        return
+
+    print_report("Cold worker", measure(args.endpoint, args.query, warm=False, runs=args.runs))
+    print_report("Warmed-up worker", measure(args.endpoint, args.query, warm=True, runs=args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,35 @@
-workers = 1
-bind = "0.0.0.0:8080"
+import multiprocessing
+import os
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8080")
 worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+# Workers warm up in post_fork before their first heartbeat, so they need more than the default 30 seconds.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Import the application once in the master so that workers inherit the loaded modules.
+# Not compatible with --reload, which reloads the code in the workers; set GUNICORN_PRELOAD=false for development.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+
+def on_starting(server):
+    from app.warmup import worker_configuration_warnings
+
+    for warning in worker_configuration_warnings(server.cfg.workers):
+        server.log.warning(warning)
+
+    if not server.cfg.preload_app:
+        return
+
+    from app.warmup import import_heavy_modules
+
+    elapsed = import_heavy_modules()
+    server.log.info(f"Imported application modules in {elapsed:.2f}s")
+
+
+def post_fork(server, worker):
+    from app.warmup import warm_up
+
+    elapsed = warm_up()
+    server.log.info(f"Worker {worker.pid} warmed up in {elapsed:.2f}s")
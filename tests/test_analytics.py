@@ -0,0 +1,131 @@
+from datetime import date
+from decimal import Decimal
+
+import duckdb
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.analytics import AnalyticsMirror, QueryRouter, results_match, run_on_rows
+from app.models import Base
+
+
+def insert_orders(engine, ids) -> None:
+    with engine.begin() as connection:
+        for order_id in ids:
+            connection.execute(
+                text("INSERT INTO orders VALUES (:id, :date, :quantity, :amount, 1, :user_id)"),
+                {"id": order_id, "date": date(2024, 1, 1), "quantity": order_id, "amount": 1.25, "user_id": 1},
+            )
+
+
+@pytest.fixture
+def postgres():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users VALUES (1, 'a@example.com', 'A')"))
+        connection.execute(text("INSERT INTO products VALUES (1, 'Product')"))
+    insert_orders(engine, range(1, 6))
+    return engine
+
+
+@pytest.fixture
+def mirror(postgres):
+    mirror = AnalyticsMirror(postgres, batch_size=2, overlap=2)
+    mirror.sync()
+    return mirror
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*) FROM orders",
+    "select user_id, sum(amount) from orders group by user_id",
+    "WITH monthly AS (SELECT date, SUM(amount) AS total FROM orders GROUP BY date) SELECT MAX(total) FROM monthly",
+])
+def test_aggregates_go_to_the_mirror(mirror, postgres, sql):
+    assert QueryRouter(mirror, postgres).is_mirror_query(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM orders",
+    "SELECT COUNT(*) FROM orders WHERE orders.id = 3",
+    "DELETE FROM orders WHERE amount > (SELECT AVG(amount) FROM orders)",
+    "SELECT COUNT(*) FROM orders; DROP TABLE orders",
+])
+def test_other_queries_go_to_postgres(mirror, postgres, sql):
+    assert not QueryRouter(mirror, postgres).is_mirror_query(sql)
+
+
+def test_sync_copies_new_rows(mirror, postgres):
+    insert_orders(postgres, [6, 7])
+
+    mirror.sync()
+
+    assert mirror.run("SELECT COUNT(*) AS count, MAX(id) AS max_id FROM orders") == [{"count": 7, "max_id": 7}]
+
+
+def test_sync_picks_up_late_rows_within_the_overlap(postgres):
+    with postgres.begin() as connection:
+        connection.execute(text("DELETE FROM orders WHERE id = 4"))
+    mirror = AnalyticsMirror(postgres, overlap=2)
+    mirror.sync()
+    insert_orders(postgres, [4])
+
+    mirror.sync()
+
+    assert mirror.run("SELECT COUNT(*) AS count, COUNT(DISTINCT id) AS ids FROM orders") == [{"count": 5, "ids": 5}]
+
+
+def test_mirror_uses_integer_division(mirror):
+    assert mirror.run("SELECT 7 / 2 AS quotient, SUM(quantity) / COUNT(*) AS average FROM orders") == [
+        {"quotient": 3, "average": 3}
+    ]
+
+
+def test_mirror_cannot_read_files(mirror):
+    with pytest.raises(duckdb.Error):
+        mirror.run("SELECT COUNT(*), MAX(content) FROM read_text('/etc/passwd')")
+
+
+def test_mismatched_query_is_routed_to_postgres(mirror, postgres):
+    router = QueryRouter(mirror, postgres, verify_sample_rate=1.0, max_staleness=3600)
+    insert_orders(postgres, [6])
+
+    assert router.run("SELECT COUNT(*) FROM orders") == [{"COUNT(*)": 6}]
+    router.verify_sample_rate = 0.0
+    assert router.run("SELECT COUNT(*)  FROM orders") == [{"COUNT(*)": 6}]
+
+    assert router.stats["mismatches"] == 1
+    assert router.stats["postgres"] == 1
+
+
+@pytest.mark.parametrize("left, right, ordered, expected", [
+    ([{"total": Decimal("1.10")}], [{"sum": 1.1}], True, True),
+    ([{"a": 1}, {"a": 2}], [{"a": 2}, {"a": 1}], False, True),
+    ([{"a": 1}, {"a": 2}], [{"a": 2}, {"a": 1}], True, False),
+    ([{"a": 1}], [{"a": 1}, {"a": 1}], False, False),
+    ([{"a": None}], [{"a": 0}], False, False),
+    ([{"day": date(2024, 1, 1)}], [{"day": date(2024, 1, 2)}], False, False),
+])
+def test_results_match(left, right, ordered, expected):
+    assert results_match(left, right, ordered) is expected
+
+
+def test_run_on_rows_queries_the_given_rows():
+    rows = [{"month": "01", "total": Decimal("10.5")}, {"month": "02", "total": Decimal("20")}]
+
+    assert run_on_rows("SELECT month FROM previous WHERE total > 15;", "previous", rows) == [{"month": "02"}]
+
+
+@pytest.mark.parametrize("sql", [
+    "DROP TABLE previous",
+    "SELECT * FROM previous; SELECT 1",
+    "COPY previous TO '/tmp/previous.csv'",
+])
+def test_run_on_rows_rejects_other_statements(sql):
+    with pytest.raises(ValueError):
+        run_on_rows(sql, "previous", [{"a": 1}])
+
+
+def test_run_on_rows_cannot_read_files():
+    with pytest.raises(duckdb.Error):
+        run_on_rows("SELECT * FROM read_text('/etc/passwd')", "previous", [{"a": 1}])
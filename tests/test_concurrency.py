@@ -0,0 +1,176 @@
+import threading
+import time
+
+import pytest
+
+from app.concurrency import AdmissionRejected, ConcurrencyGovernor, Priority, ResourceLimiter, _current_priority
+
+
+def wait_for_waiters(limiter: ResourceLimiter, count: int) -> None:
+    deadline = time.monotonic() + 5
+    while len(limiter._waiters) < count:
+        assert time.monotonic() < deadline, "waiters did not queue up"
+        time.sleep(0.01)
+
+
+def start_waiter(
+    limiter: ResourceLimiter,
+    name: str,
+    priority: Priority,
+    admitted: list,
+    timeout: float = 5
+) -> threading.Thread:
+    def wait() -> None:
+        try:
+            limiter.acquire(priority, timeout=timeout)
+        except AdmissionRejected as e:
+            admitted.append((name, e.status_code))
+            return
+        admitted.append(name)
+        limiter.release()
+
+    thread = threading.Thread(target=wait)
+    thread.start()
+    return thread
+
+
+def test_acquire_takes_free_slot_without_queueing():
+    limiter = ResourceLimiter("test", max_concurrency=2, max_queue=0, timeout=1)
+
+    limiter.acquire()
+    limiter.acquire()
+
+    assert limiter._active == 2
+    assert limiter._waiters == []
+
+
+def test_interactive_waiters_are_admitted_before_batch_waiters():
+    limiter = ResourceLimiter("test", max_concurrency=1, max_queue=4, timeout=5)
+    limiter.acquire()
+    admitted = []
+
+    threads = [start_waiter(limiter, "batch", Priority.BATCH, admitted)]
+    wait_for_waiters(limiter, 1)
+    threads.append(start_waiter(limiter, "interactive", Priority.INTERACTIVE, admitted))
+    wait_for_waiters(limiter, 2)
+    limiter.release()
+    for thread in threads:
+        thread.join()
+
+    assert admitted == ["interactive", "batch"]
+
+
+def test_waiters_with_same_priority_are_admitted_in_arrival_order():
+    limiter = ResourceLimiter("test", max_concurrency=1, max_queue=4, timeout=5)
+    limiter.acquire()
+    admitted = []
+    threads = []
+
+    for name in ("first", "second", "third"):
+        threads.append(start_waiter(limiter, name, Priority.BATCH, admitted))
+        wait_for_waiters(limiter, len(threads))
+    limiter.release()
+    for thread in threads:
+        thread.join()
+
+    assert admitted == ["first", "second", "third"]
+    assert limiter._active == 0
+
+
+def test_full_queue_is_rejected_with_429():
+    limiter = ResourceLimiter("test", max_concurrency=1, max_queue=1, timeout=5)
+    limiter.acquire()
+    admitted = []
+    thread = start_waiter(limiter, "waiter", Priority.INTERACTIVE, admitted)
+    wait_for_waiters(limiter, 1)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.acquire(Priority.INTERACTIVE)
+    with pytest.raises(AdmissionRejected):
+        limiter.check()
+
+    assert rejected.value.status_code == 429
+    assert rejected.value.retry_after >= 1
+    limiter.release()
+    thread.join()
+    assert admitted == ["waiter"]
+
+
+def test_check_passes_while_a_slot_is_free():
+    limiter = ResourceLimiter("test", max_concurrency=1, max_queue=0, timeout=1)
+
+    limiter.check()
+
+
+def test_deadline_is_rejected_with_503():
+    limiter = ResourceLimiter("test", max_concurrency=1, max_queue=1, timeout=5)
+    limiter.acquire()
+
+    started_at = time.monotonic()
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.acquire(timeout=0.05)
+
+    assert rejected.value.status_code == 503
+    assert time.monotonic() - started_at < 1
+    assert limiter._waiters == []
+
+
+def test_slot_is_available_after_a_timed_out_wait():
+    limiter = ResourceLimiter("test", max_concurrency=1, max_queue=2, timeout=5)
+    limiter.acquire()
+    with pytest.raises(AdmissionRejected):
+        limiter.acquire(timeout=0.01)
+
+    limiter.release()
+    limiter.acquire(timeout=0)
+
+    assert limiter._active == 1
+    assert limiter._waiters == []
+
+
+def test_timed_out_waiter_does_not_block_the_waiters_behind_it():
+    limiter = ResourceLimiter("test", max_concurrency=1, max_queue=2, timeout=5)
+    limiter.acquire()
+    admitted = []
+
+    batch = start_waiter(limiter, "batch", Priority.BATCH, admitted)
+    wait_for_waiters(limiter, 1)
+    interactive = start_waiter(limiter, "interactive", Priority.INTERACTIVE, admitted, timeout=0.05)
+    interactive.join()
+    limiter.release()
+    batch.join()
+
+    assert admitted == [("interactive", 503), "batch"]
+    assert limiter._active == 0
+
+
+def test_slot_releases_on_error():
+    limiter = ResourceLimiter("test", max_concurrency=1, max_queue=0, timeout=1)
+
+    with pytest.raises(RuntimeError):
+        with limiter.slot():
+            raise RuntimeError
+
+    assert limiter._active == 0
+
+
+def test_admit_sets_the_request_priority():
+    limiter = ResourceLimiter("test", max_concurrency=1, max_queue=0, timeout=1)
+    governor = ConcurrencyGovernor(limiter, limiter, limiter)
+
+    with governor.admit(Priority.BATCH, limiter):
+        assert _current_priority.get() == Priority.BATCH
+
+    assert _current_priority.get() == Priority.INTERACTIVE
+
+
+def test_admit_rejects_when_a_queue_is_full():
+    limiter = ResourceLimiter("test", max_concurrency=1, max_queue=0, timeout=1)
+    governor = ConcurrencyGovernor(limiter, limiter, limiter)
+    limiter.acquire()
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        with governor.admit(Priority.INTERACTIVE, limiter):
+            pass
+
+    assert rejected.value.status_code == 429
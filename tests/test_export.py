@@ -0,0 +1,180 @@
+import io
+from decimal import Decimal
+
+import psycopg2.extras
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy import create_engine
+
+from app.concurrency import ResourceLimiter
+from app.export import (
+    ExportColumn, ExportError, QueryResultStream, sign_export_query, validate_export_query, verify_export_signature,
+    write_csv, write_parquet,
+)
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM orders", "SELECT * FROM orders"),
+    ("  select id from users;  ", "select id from users"),
+    ("WITH totals AS (SELECT SUM(amount) FROM orders) SELECT * FROM totals;", (
+        "WITH totals AS (SELECT SUM(amount) FROM orders) SELECT * FROM totals"
+    )),
+])
+def test_validate_export_query_accepts_single_select(sql, expected):
+    assert validate_export_query(sql) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM orders",
+    "EXPLAIN ANALYZE SELECT * FROM orders",
+    "SELECT * FROM orders; DROP TABLE orders",
+    "SELECT * FROM orders; SELECT * FROM users",
+    "WITH deleted AS (DELETE FROM orders RETURNING *) SELECT * FROM deleted",
+    "",
+])
+def test_validate_export_query_rejects_other_statements(sql):
+    with pytest.raises(ExportError):
+        validate_export_query(sql)
+
+
+def test_parquet_decimals_use_the_column_scale():
+    columns = [ExportColumn("average"), ExportColumn("amount", 10, 2)]
+    batches = iter([
+        [(Decimal("1.5"), Decimal("1.25"))],
+        [(Decimal("2.333333333333333333"), Decimal("12345678.12"))],
+    ])
+
+    table = pq.read_table(io.BytesIO(b"".join(write_parquet(columns, batches))))
+
+    assert table.schema.field("average").type == pa.string()
+    assert table.schema.field("amount").type == pa.decimal128(10, 2)
+    assert table.column("average").to_pylist() == ["1.5", "2.333333333333333333"]
+    assert table.column("amount").to_pylist() == [Decimal("1.25"), Decimal("12345678.12")]
+
+
+def test_csv_writes_header_and_rows():
+    batches = iter([[(1, "a")], [(2, None)]])
+
+    output = b"".join(write_csv([ExportColumn("id"), ExportColumn("name")], batches))
+
+    assert output == b"id,name\r\n1,a\r\n2,\r\n"
+
+
+class FakeCursor:
+    def __init__(self, connection, name):
+        self.connection = connection
+        self.name = name
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+
+    def execute(self, statement, parameters=None):
+        self.connection.statements.append((self.name, statement))
+        if statement.lower().startswith(("select", "show")):
+            self.description = [("value", 25, None, None, None, None, None)]
+            self._rows = [("PostgreSQL 16.0",)] if "version()" in statement else [("on",), ("off",)]
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=None):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """A psycopg2 connection that records each statement with the name of its cursor, None for client-side ones."""
+
+    def __init__(self, statements):
+        self.statements = statements
+        self.notices = []
+        self.autocommit = False
+
+    def cursor(self, name=None, **kwargs):
+        return FakeCursor(self, name)
+
+    def rollback(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def postgres_statements(monkeypatch):
+    monkeypatch.setattr(psycopg2.extras, "register_uuid", lambda *args: None)
+    statements = []
+    engine = create_engine(
+        "postgresql+psycopg2://",
+        creator=lambda: FakeConnection(statements),
+        use_native_hstore=False,
+    )
+    engine.connect().close()
+    statements.clear()
+    return engine, statements
+
+
+def test_only_the_query_uses_a_server_side_cursor(postgres_statements):
+    engine, statements = postgres_statements
+    stream = QueryResultStream("SELECT value FROM settings", engine=engine, batch_size=1, statement_timeout=2.5).open()
+
+    batches = [list(batch) for batch in stream.batches()]
+
+    assert batches == [[("on",)], [("off",)]]
+    assert statements == [
+        (None, "SET TRANSACTION READ ONLY"),
+        (None, "SET LOCAL statement_timeout = 2500"),
+        (statements[2][0], "SELECT value FROM settings"),
+    ]
+    assert statements[2][0] is not None
+
+
+def test_close_releases_the_slot_once(postgres_statements):
+    engine, _ = postgres_statements
+    limiter = ResourceLimiter("export", max_concurrency=1, max_queue=0, timeout=1)
+    stream = QueryResultStream("SELECT 1", engine=engine, limiter=limiter).open()
+
+    stream.close()
+    stream.close()
+
+    assert limiter._active == 0
+
+
+def test_signed_sql_is_accepted(monkeypatch):
+    monkeypatch.setenv("EXPORT_SIGNING_KEY", "secret")
+
+    verify_export_signature("SELECT 1", sign_export_query("SELECT 1"))
+
+
+@pytest.mark.parametrize("signature", [None, "", "0" * 64])
+def test_unsigned_sql_is_rejected(monkeypatch, signature):
+    monkeypatch.setenv("EXPORT_SIGNING_KEY", "secret")
+
+    with pytest.raises(ExportError):
+        verify_export_signature("SELECT 1", signature)
+
+
+def test_sql_signed_for_another_query_is_rejected(monkeypatch):
+    monkeypatch.setenv("EXPORT_SIGNING_KEY", "secret")
+
+    with pytest.raises(ExportError):
+        verify_export_signature("SELECT * FROM users", sign_export_query("SELECT 1"))
+
+
+def test_sql_export_is_disabled_without_signing_key(monkeypatch):
+    monkeypatch.delenv("EXPORT_SIGNING_KEY", raising=False)
+
+    assert sign_export_query("SELECT 1") is None
+    with pytest.raises(ExportError):
+        verify_export_signature("SELECT 1", "anything")
@@ -0,0 +1,84 @@
+from datetime import date
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from sqlalchemy import create_engine, text
+
+from app.agents import graph_agent
+from app.agents.graph_agent import GraphSQLAgent
+from app.models import Base
+from app.sessions import BoundedMemorySaver
+
+
+MONTHLY_TOTALS = "SELECT strftime('%m', date) AS month, SUM(amount) AS total FROM orders GROUP BY month"
+
+
+@pytest.fixture
+def db_url(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    url = f"sqlite:///{tmp_path / 'orders.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for month in range(1, 13):
+            connection.execute(
+                text("INSERT INTO orders VALUES (:id, :date, 1, :amount, 1, 1)"),
+                {"id": month, "date": date(2024, month, 1), "amount": month * 10},
+            )
+    return url
+
+
+def ask(agent: GraphSQLAgent, question: str, replies: list, session_id: str = "session"):
+    agent.llm = GenericFakeChatModel(messages=iter([AIMessage(content=reply) for reply in replies]))
+    return agent.query(question, session_id=session_id)
+
+
+def session_values(agent: GraphSQLAgent, session_id: str = "session") -> dict:
+    return agent.app.get_state({"configurable": {"thread_id": session_id}}).values
+
+
+def test_follow_up_on_previous_result_returns_sql_that_runs_on_the_database(db_url):
+    agent = GraphSQLAgent(db_url, checkpointer=BoundedMemorySaver())
+    ask(agent, "Monthly totals?", ["YES", f"```sql\n{MONTHLY_TOTALS}\n```", "Totals"])
+
+    _, raw_sql = ask(agent, "Just March?", [
+        "YES", "```sql\nSELECT total FROM previous_result WHERE month = '03'\n```", "30"
+    ])
+    _, second_raw_sql = ask(agent, "And above 20?", [
+        "YES", "```sql\nSELECT total FROM previous_result WHERE total > 20\n```", "30"
+    ])
+
+    assert raw_sql == (
+        f"WITH previous_result AS ({MONTHLY_TOTALS})\nSELECT total FROM previous_result WHERE month = '03'"
+    )
+    assert session_values(agent)["previous_sql_query"] == raw_sql
+    with create_engine(db_url).connect() as connection:
+        assert connection.execute(text(raw_sql)).all() == [(30,)]
+        assert connection.execute(text(second_raw_sql)).all() == [(30,)]
+
+
+def test_large_results_are_truncated_and_not_carried_over(db_url, monkeypatch):
+    monkeypatch.setattr(graph_agent, "MAX_RESULT_ROWS", 5)
+    agent = GraphSQLAgent(db_url, checkpointer=BoundedMemorySaver())
+    ask(agent, "Monthly totals?", ["YES", f"```sql\n{MONTHLY_TOTALS}\n```", "Totals"])
+
+    values = session_values(agent)
+    assert len(values["query_result"]) == 5
+    assert values["query_result_truncated"]
+
+    ask(agent, "Just March?", ["YES", "```sql\nSELECT 30 AS total\n```", "30"])
+
+    assert session_values(agent).get("previous_query_result") is None
+    assert session_values(agent)["previous_sql_query"] == MONTHLY_TOTALS
+
+
+@pytest.mark.parametrize("sql_query, expected", [
+    ("SELECT * FROM previous_result;", "WITH previous_result AS (SELECT 1)\nSELECT * FROM previous_result"),
+    (
+        "WITH top AS (SELECT * FROM previous_result) SELECT * FROM top",
+        "WITH previous_result AS (SELECT 1), top AS (SELECT * FROM previous_result) SELECT * FROM top",
+    ),
+])
+def test_compose_previous_result_query(sql_query, expected):
+    assert GraphSQLAgent._compose_previous_result_query("SELECT 1;", sql_query) == expected
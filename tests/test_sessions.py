@@ -0,0 +1,103 @@
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+import app.sessions
+import app.sessions_sqlite
+from app.sessions import BoundedMemorySaver
+from app.sessions_sqlite import create_sqlite_checkpointer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(app.sessions, "time", clock)
+    monkeypatch.setattr(app.sessions_sqlite, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def saver(request, clock):
+    if request.param == "memory":
+        yield BoundedMemorySaver(max_sessions=2, session_ttl=60)
+        return
+    saver = create_sqlite_checkpointer(":memory:", max_sessions=2, session_ttl=60)
+    yield saver
+    saver.conn.close()
+
+
+def session_config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def save_checkpoint(saver, thread_id: str, clock: FakeClock) -> str:
+    clock.advance(1)
+    checkpoint = empty_checkpoint()
+    saver.put(session_config(thread_id), checkpoint, {}, {})
+    return checkpoint["id"]
+
+
+def test_least_recently_used_session_is_evicted(saver, clock):
+    save_checkpoint(saver, "first", clock)
+    save_checkpoint(saver, "second", clock)
+    save_checkpoint(saver, "first", clock)
+
+    save_checkpoint(saver, "third", clock)
+
+    assert saver.get_tuple(session_config("first")) is not None
+    assert saver.get_tuple(session_config("second")) is None
+    assert saver.get_tuple(session_config("third")) is not None
+
+
+def test_session_expires_after_ttl(saver, clock):
+    save_checkpoint(saver, "session", clock)
+    clock.advance(59)
+    assert saver.get_tuple(session_config("session")) is not None
+
+    clock.advance(2)
+
+    assert saver.get_tuple(session_config("session")) is None
+
+
+def test_expired_sessions_are_evicted_on_put(saver, clock):
+    save_checkpoint(saver, "idle", clock)
+    assert list(saver.list(session_config("idle")))
+    clock.advance(61)
+
+    save_checkpoint(saver, "active", clock)
+
+    assert list(saver.list(session_config("idle"))) == []
+
+
+def test_only_latest_checkpoints_are_kept(saver, clock):
+    checkpoint_ids = [save_checkpoint(saver, "session", clock) for _ in range(4)]
+
+    kept = [checkpoint.config["configurable"]["checkpoint_id"] for checkpoint in saver.list(session_config("session"))]
+
+    assert sorted(kept) == checkpoint_ids[-2:]
+    assert saver.get_tuple(session_config("session")).config["configurable"]["checkpoint_id"] == checkpoint_ids[-1]
+
+
+def test_unknown_session_has_no_checkpoint(saver):
+    assert saver.get_tuple(session_config("unknown")) is None
+
+
+def test_delete_session(saver, clock):
+    save_checkpoint(saver, "session", clock)
+
+    saver.delete_session("session")
+
+    assert saver.get_tuple(session_config("session")) is None
@@ -0,0 +1,25 @@
+from app.warmup import worker_configuration_warnings
+
+
+def test_single_worker_has_no_warnings(monkeypatch):
+    monkeypatch.setenv("ANALYTICS_MIRROR_PATH", "mirror.duckdb")
+
+    assert worker_configuration_warnings(1) == []
+
+
+def test_memory_sessions_and_file_mirror_are_reported_for_several_workers(monkeypatch):
+    monkeypatch.delenv("SESSION_BACKEND", raising=False)
+    monkeypatch.setenv("ANALYTICS_MIRROR_PATH", "mirror.duckdb")
+
+    warnings = worker_configuration_warnings(4)
+
+    assert any("SESSION_BACKEND=memory" in warning for warning in warnings)
+    assert any("ANALYTICS_MIRROR_PATH=mirror.duckdb" in warning for warning in warnings)
+    assert any("4 times higher" in warning for warning in warnings)
+
+
+def test_shared_sessions_and_memory_mirror_only_report_the_limits(monkeypatch):
+    monkeypatch.setenv("SESSION_BACKEND", "sqlite")
+    monkeypatch.setenv("ANALYTICS_MIRROR_PATH", ":memory:")
+
+    assert len(worker_configuration_warnings(4)) == 1